@@ -0,0 +1,433 @@
+"""
+Общий слой сбора данных Stack Exchange API: сессия, ретраи, пейсинг,
+дисковый кэш страниц и агрегация по дням. CLI-скрипты импортируют отсюда,
+поэтому пул соединений, кэш и состояние backoff у всех входных точек общие.
+"""
+
+import concurrent.futures
+import datetime as dt
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson  # опционально: декодирует JSON в разы быстрее stdlib
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # опционально: поддержка Content-Encoding: br
+except ImportError:
+    brotli = None
+
+API_URL = "https://api.stackexchange.com/2.3/questions"
+FILTER_CREATE_URL = "https://api.stackexchange.com/2.3/filters/create"
+
+# Минимальный фильтр: из вопроса нам нужен только creation_date, плюс
+# служебные поля обёртки. Режет страницу с ~100 КБ до ~2 КБ.
+FILTER_INCLUDE = ".items;.has_more;.backoff;.quota_remaining;.quota_max;question.creation_date"
+
+PAGESIZE = 100
+
+# Общая сессия с пулом соединений: переиспользуем TCP+TLS соединение
+# (keep-alive) между страницами и тегами вместо нового handshake на каждый GET.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+
+# Просим сжатие явно (некоторые прокси срезают дефолтный заголовок urllib3);
+# br объявляем только если есть чем его распаковать.
+SESSION.headers["Accept-Encoding"] = "br, gzip, deflate" if brotli is not None else "gzip, deflate"
+
+
+def _loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# --- Дата/время ---------------------------------------------------------
+
+# Дни в месяцах невисокосного года; февраль корректируется отдельно.
+_DIM = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _is_leap(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def month_delta(d: dt.datetime, months: int) -> dt.datetime:
+    """Смещение по месяцам без внешних зависимостей."""
+    y = d.year + (d.month - 1 + months) // 12
+    m = (d.month - 1 + months) % 12 + 1
+    days_in_month = 29 if (m == 2 and _is_leap(y)) else _DIM[m - 1]
+    return d.replace(year=y, month=m, day=min(d.day, days_in_month))
+
+
+# Ординал 1970-01-01 в proleptic-григорианском календаре (dt.date.toordinal).
+_EPOCH_ORDINAL = 719163
+
+# Кэш "номер дня -> YYYY-MM-DD": окно в несколько месяцев даёт от силы пару
+# сотен записей, зато в горячем цикле не создаём datetime на каждый вопрос.
+_DAY_CACHE: dict = {}
+
+
+def day_iso(day_index: int) -> str:
+    """YYYY-MM-DD (UTC) из номера дня (epoch seconds // 86400)."""
+    iso = _DAY_CACHE.get(day_index)
+    if iso is None:
+        iso = _DAY_CACHE.setdefault(day_index, dt.date.fromordinal(day_index + _EPOCH_ORDINAL).isoformat())
+    return iso
+
+
+def day_bucket(created_epoch: int) -> str:
+    """YYYY-MM-DD (UTC) из epoch seconds целочисленной арифметикой."""
+    return day_iso(created_epoch // 86400)
+
+
+# --- Ретраи и пейсинг ---------------------------------------------------
+
+# Временные ошибки API: 429 (квота/throttle) и 5xx стоит ретраить, не падать.
+RETRYABLE_STATUS = (429, 502, 503, 504)
+MAX_RETRIES = 7
+
+# AIMD-пейсинг по quota_remaining/quota_max: при остатке квоты < 10%
+# удваиваем паузу между запросами (мультипликативно), при остатке > 50%
+# уполовиниваем её обратно. Общий для всех потоков, поэтому под локом.
+_pacing_lock = threading.Lock()
+_pacing_delay = 0.0
+
+
+def _pacing_sleep() -> None:
+    with _pacing_lock:
+        delay = _pacing_delay
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _pacing_update(quota_remaining: int, quota_max: int) -> None:
+    global _pacing_delay
+    if quota_max <= 0:
+        return
+    ratio = quota_remaining / quota_max
+    with _pacing_lock:
+        if ratio < 0.1:
+            _pacing_delay = max(1.0, _pacing_delay * 2)
+        elif ratio > 0.5:
+            _pacing_delay /= 2
+
+
+def _get_with_retry(params: dict, headers: dict = None) -> "requests.Response":
+    """
+    GET с экспоненциальным backoff + jitter на 429/5xx.
+    Уважает заголовок Retry-After. После MAX_RETRIES бросает RuntimeError.
+    """
+    global _pacing_delay
+    r = None
+    for attempt in range(MAX_RETRIES):
+        _pacing_sleep()
+        r = SESSION.get(API_URL, params=params, headers=headers, timeout=30)
+        if r.status_code not in RETRYABLE_STATUS:
+            return r
+
+        if r.status_code == 429:
+            # Нас уже режут — мультипликативно сбрасываем темп (β=0.5).
+            with _pacing_lock:
+                _pacing_delay = max(1.0, _pacing_delay * 2)
+
+        delay = min(60.0, 0.5 * 2 ** attempt) + random.uniform(0, 0.5)
+        retry_after = int(r.headers.get("Retry-After", 0))
+        time.sleep(max(delay, retry_after))
+
+    raise RuntimeError(f"HTTP {r.status_code} after {MAX_RETRIES} retries | body={r.text[:1500]}")
+
+
+# --- Дисковый кэш страниц -----------------------------------------------
+
+# Кэш страниц на диске: перезапуски по тем же (tag, период, page) не тратят
+# квоту и позволяют докачать данные после аборта. Сбрасывается удалением папки.
+CACHE_DIR = ".fetch_cache"
+
+# Моложе суток — отдаём с диска без сети; старше — ревалидируем условным GET
+# (If-None-Match): на 304 тело пустое и переиспользуется дисковая копия.
+CACHE_TTL = 86400
+
+ETAGS_PATH = os.path.join(CACHE_DIR, "etags.json")
+
+_etag_lock = threading.Lock()
+_etags = None
+
+
+def _etag_get(key: str):
+    global _etags
+    with _etag_lock:
+        if _etags is None:
+            try:
+                with open(ETAGS_PATH, "rb") as f:
+                    _etags = _loads(f.read())
+            except (OSError, ValueError):
+                _etags = {}
+        return _etags.get(key)
+
+
+def _etag_set(key: str, etag: str) -> None:
+    global _etags
+    with _etag_lock:
+        if _etags is None:
+            _etags = {}
+        _etags[key] = etag
+        tmp = ETAGS_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_etags, f)
+        os.replace(tmp, ETAGS_PATH)
+
+
+def _cache_path(tag: str, fromdate: int, todate: int, page: int) -> str:
+    return os.path.join(CACHE_DIR, f"{tag}_{fromdate}_{todate}_{page}.json")
+
+
+def _cache_fresh(tag: str, fromdate: int, todate: int, page: int) -> bool:
+    try:
+        return time.time() - os.path.getmtime(_cache_path(tag, fromdate, todate, page)) < CACHE_TTL
+    except OSError:
+        return False
+
+
+def _cache_get(tag: str, fromdate: int, todate: int, page: int):
+    path = _cache_path(tag, fromdate, todate, page)
+    try:
+        with open(path, "rb") as f:
+            return _loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_put(tag: str, fromdate: int, todate: int, page: int, payload: dict) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(tag, fromdate, todate, page)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)  # атомарно: не оставляем битых файлов при прерывании
+
+
+# --- Минимальный фильтр -------------------------------------------------
+
+_filter_lock = threading.Lock()
+_minimal_filter = None
+
+
+def _get_filter() -> str:
+    """
+    Один раз создаёт минимальный фильтр через /filters/create и кэширует его.
+    При любой ошибке откатываемся на "default" — данных больше, но работает.
+    """
+    global _minimal_filter
+    with _filter_lock:
+        if _minimal_filter is None:
+            try:
+                r = SESSION.get(
+                    FILTER_CREATE_URL,
+                    params={"include": FILTER_INCLUDE, "base": "none", "unsafe": "false"},
+                    timeout=30,
+                )
+                r.raise_for_status()
+                _minimal_filter = _loads(r.content)["items"][0]["filter"]
+            except Exception as e:
+                print(f"WARN: filter create failed ({e}), falling back to 'default'")
+                _minimal_filter = "default"
+    return _minimal_filter
+
+
+# --- Сбор и агрегация ---------------------------------------------------
+
+
+def window_slices(fromdate: int, todate: int, k: int):
+    """Режет полуинтервал [fromdate, todate) на k примерно равных под-окон."""
+    k = max(1, min(k, todate - fromdate))
+    step = (todate - fromdate) // k
+    edges = [fromdate + i * step for i in range(k)] + [todate]
+    for i in range(k):
+        yield edges[i], edges[i + 1]
+
+
+def fetch_questions(tag: str, fromdate: int, todate: int, pagesize: int = PAGESIZE, max_pages: int = 50):
+    """
+    Генератор creation_date (epoch seconds) вопросов. Отдаёт голые int,
+    чтобы словари страницы не жили дольше самой страницы.
+    Уважает backoff, ретраит 429/5xx.
+    Бросает RuntimeError на остальных HTTP/API ошибках.
+    """
+    page = 1
+
+    while page <= max_pages:
+        params = {
+            "site": "stackoverflow",
+            "tagged": tag,
+            "fromdate": fromdate,
+            "todate": todate,
+            "page": page,
+            "pagesize": pagesize,
+            "order": "asc",
+            "sort": "creation",
+            "filter": _get_filter(),
+        }
+
+        cached = _cache_get(tag, fromdate, todate, page)
+
+        if cached is not None and _cache_fresh(tag, fromdate, todate, page):
+            payload = cached
+        else:
+            # Для устаревшей дисковой копии делаем условный GET: на 304 тело
+            # пустое (почти ноль трафика) и копия просто продлевается.
+            etag_key = f"{tag}_{fromdate}_{todate}_{page}"
+            headers = None
+            if cached is not None:
+                etag = _etag_get(etag_key)
+                if etag:
+                    headers = {"If-None-Match": etag}
+
+            r = _get_with_retry(params, headers=headers)
+
+            if r.status_code == 304 and cached is not None:
+                # Не изменилось: продлеваем свежесть дисковой копии.
+                os.utime(_cache_path(tag, fromdate, todate, page))
+                payload = cached
+            elif r.status_code != 200:
+                # В теле обычно error_name/error_message
+                raise RuntimeError(f"HTTP {r.status_code} | tag={tag} | page={page} | body={r.text[:1500]}")
+            else:
+                payload = _loads(r.content)
+
+                # лимиты/квота
+                if "quota_remaining" in payload and payload["quota_remaining"] == 0:
+                    raise RuntimeError(f"Quota exhausted (quota_remaining=0) | tag={tag} | page={page}")
+
+                # Проактивно замедляемся, пока квота не кончилась совсем.
+                _pacing_update(payload.get("quota_remaining", -1), payload.get("quota_max", 0))
+
+                # backoff от API (обязателен к соблюдению)
+                backoff = int(payload.get("backoff", 0))
+                if backoff > 0:
+                    time.sleep(backoff)
+
+                _cache_put(tag, fromdate, todate, page, payload)
+
+                new_etag = r.headers.get("ETag")
+                if new_etag:
+                    _etag_set(etag_key, new_etag)
+
+        items = payload.get("items", [])
+        if not items:
+            # Пустая страница — дальше листать бессмысленно, даже если
+            # has_more по какой-то причине выставлен.
+            break
+
+        for item in items:
+            created = item["creation_date"]
+            # order=asc, sort=creation: всё дальше гарантированно за границей.
+            if created >= todate:
+                return
+            yield created
+
+        if not payload.get("has_more"):
+            break
+
+        page += 1
+
+
+def collect_window(tag: str, fromdate: int, todate: int, max_pages: int) -> Counter:
+    """Счётчик day_index -> count для одного тега в одном под-окне."""
+    day_counts = Counter()
+
+    try:
+        # Counter.update с генератором считает на стороне C — без питоновского
+        # инкремента словаря на каждый вопрос. Частичный счёт при обрыве
+        # сохраняется: Counter инкрементирует по мере итерации.
+        day_counts.update(created // 86400 for created in fetch_questions(tag, fromdate, todate, max_pages=max_pages))
+    except RuntimeError as e:
+        print("ERROR:", e)
+        print(f"Stopped: tag={tag} | fetched={sum(day_counts.values())}")
+        return day_counts
+
+    fetched = sum(day_counts.values())
+
+    # Упёрлись в потолок pagesize*max_pages — окно слишком широкое, данные
+    # обрезаны. Делим его пополам и пересобираем обе половины целиком.
+    if fetched >= PAGESIZE * max_pages and todate - fromdate > 1:
+        mid = (fromdate + todate) // 2
+        print(f"Window full: tag={tag} | bisecting [{fromdate}, {todate}) at {mid}")
+        day_counts = Counter()
+        for part_from, part_to in ((fromdate, mid), (mid, todate)):
+            day_counts.update(collect_window(tag, part_from, part_to, max_pages))
+        return day_counts
+
+    if day_counts:
+        print(f"Done: tag={tag} | fetched={fetched} | last_day_utc={day_iso(max(day_counts))}")
+    else:
+        print(f"Done: tag={tag} | fetched=0")
+
+    return day_counts
+
+
+def collect(tags, fromdate: int, todate: int, max_pages: int = 50, windows: int = 4) -> dict:
+    """Качает все (тег, под-окно) параллельно. Возвращает tag -> Counter[day_index]."""
+    # Вложенная структура вместо ключей-кортежей: счётчики внутри тега
+    # остаются целочисленными, без кортежа+строки на каждое слияние.
+    counts = {tag: Counter() for tag in tags}
+
+    # Период режем на под-окна: у API жёсткий потолок pagesize*max_pages на
+    # один запросный диапазон, под-окна его обходят и дают больше параллелизма.
+    slices = list(window_slices(fromdate, todate, windows))
+
+    # Качаем (тег, окно) параллельно: нагрузка чисто I/O-bound, сессия
+    # потокобезопасна. Число потоков умеренное, чтобы не выбивать квоту API.
+    max_workers = min(len(tags) * len(slices), 8)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for tag in tags:
+            for win_from, win_to in slices:
+                futures[pool.submit(collect_window, tag, win_from, win_to, max_pages)] = (tag, win_from)
+
+        for fut in concurrent.futures.as_completed(futures):
+            tag = futures[fut][0]
+            counts[tag].update(fut.result())
+
+    return counts
+
+
+def write_csv(counts: dict, out_path: str) -> int:
+    """
+    Пишет counts (tag -> Counter[day_index]) в CSV (date, tag, questions_count).
+    Возвращает число строк.
+    """
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    # Порядок строк прежний — по (date, tag); в YYYY-MM-DD конвертируем
+    # только здесь, по разу на строку.
+    tags = sorted(counts)
+    days = sorted({d for per_tag in counts.values() for d in per_tag})
+
+    # Пишем байты через крупный буфер, минуя модуль csv: в полях не бывает
+    # запятых/кавычек/переводов строк (даты ISO, имена тегов, числа),
+    # поэтому экранирование не нужно.
+    rows = 0
+    with open(out_path, "wb", buffering=1 << 20) as f:
+        f.write(b"date,tag,questions_count\r\n")
+        for d in days:
+            iso = day_iso(d)
+            for tag in tags:
+                cnt = counts[tag].get(d)
+                if cnt:
+                    f.write(f"{iso},{tag},{cnt}\r\n".encode())
+                    rows += 1
+
+    return rows